@@ -1,28 +1,40 @@
-import pprint
+import itertools
+import sys
+from dataclasses import dataclass
 
 # -------------------------------------------------------------------
 # Define our classes for events, groups, and fragments
 # -------------------------------------------------------------------
 
 class Message:
-    """An event that exchanges data. The exchanged items are stored in a list."""
+    """An event that exchanges data. Lists of exchanged items are stored as tuples."""
+    __slots__ = ("id", "exchanged_items")
+    type = "message"
+
     def __init__(self, id, exchanged_items):
         self.id = id
-        self.exchanged_items = exchanged_items  # a list of exchanged items
-        self.type = "message"
+        self.exchanged_items = exchanged_items  # a tuple of exchanged items
 
     def __repr__(self):
+        return f"Message(#{self.id})"
+
+    def full_repr(self):
         return f"Message({self.id}, {self.exchanged_items})"
 
 
 class State:
     """An event that indicates the machine's state."""
+    __slots__ = ("id", "state_info")
+    type = "state"
+
     def __init__(self, id, state_info):
         self.id = id
         self.state_info = state_info
-        self.type = "state"
 
     def __repr__(self):
+        return f"State(#{self.id})"
+
+    def full_repr(self):
         return f"State({self.id}, {self.state_info})"
 
 
@@ -32,19 +44,26 @@ class Group:
     A group has a guard condition (optional) and holds a list of events
     (messages or state) as well as nested fragments in chronological order.
     """
+    __slots__ = ("id", "name", "guard", "items")
+    type = "group"
+
     def __init__(self, id, name, guard=None):
         self.id = id
         self.name = name
         self.guard = guard  # The condition required for this group
         self.items = []     # Chronologically ordered events (Message, State) and/or nested fragments
-        self.type = "group"
 
     def add_item(self, item):
         self.items.append(item)
 
     def __repr__(self):
+        return f"Group(#{self.id})"
+
+    def full_repr(self):
+        """Returns the expanded representation of this group and everything below it."""
+        items_str = ", ".join(_full_repr(item) for item in self.items)
         guard_str = f", guard={self.guard}" if self.guard is not None else ""
-        return f"{self.name}(items={self.items}{guard_str})"
+        return f"{self.name}(items=[{items_str}]{guard_str})"
 
 
 class Fragment:
@@ -52,17 +71,78 @@ class Fragment:
     Represents a branching point in the scenario.
     A fragment holds one or more groups (each a possible branch/choice).
     """
+    __slots__ = ("id", "name", "groups")
+    type = "fragment"
+
     def __init__(self, id, name):
         self.id = id
         self.name = name
         self.groups = []  # The groups (branches) for this fragment, in the order added
-        self.type = "fragment"
 
     def add_group(self, group):
         self.groups.append(group)
 
     def __repr__(self):
-        return f"{self.name}(groups={self.groups})"
+        return f"Fragment(#{self.id})"
+
+    def full_repr(self):
+        """Returns the expanded representation of this fragment and everything below it."""
+        groups_str = ", ".join(_full_repr(group) for group in self.groups)
+        return f"{self.name}(groups=[{groups_str}])"
+
+
+def _full_repr(item):
+    """Returns item.full_repr(), or repr(item) for anything that is not a scenario node."""
+    full_repr = getattr(item, "full_repr", None)
+    return full_repr() if full_repr is not None else repr(item)
+
+
+# -------------------------------------------------------------------
+# A struct-of-arrays view of the scenario events, for analytics.
+#
+# The builder keeps the object tree; ScenarioBuilder.to_arrays() flattens its
+# messages and states (in chronological order) into parallel numpy arrays
+# that numba kernels such as count_messages() can scan at native speed.
+# -------------------------------------------------------------------
+
+KIND_MESSAGE = 0
+KIND_STATE = 1
+
+
+@dataclass
+class ScenarioArrays:
+    ids: "numpy.ndarray"    # int64 event IDs
+    kinds: "numpy.ndarray"  # uint8 KIND_MESSAGE / KIND_STATE
+    payload_refs: list      # exchanged_items or state_info of each event
+
+
+# numpy and numba are optional and slow to import, so they are only imported
+# by the functions that need them.
+
+def _njit(func):
+    try:
+        import numba
+    except ImportError:  # without numba the analytics kernels run as plain Python
+        return func
+    return numba.njit(func)
+
+
+def _count_messages(kinds):
+    return (kinds == KIND_MESSAGE).sum()
+
+
+_count_messages_kernel = None
+
+
+def count_messages(kinds):
+    """
+    Counts the message events in a ScenarioArrays.kinds array.
+    The kernel is compiled with numba.njit on first use when numba is installed.
+    """
+    global _count_messages_kernel
+    if _count_messages_kernel is None:
+        _count_messages_kernel = _njit(_count_messages)
+    return _count_messages_kernel(kinds)
 
 
 # -------------------------------------------------------------------
@@ -75,49 +155,107 @@ class Fragment:
 # the fragment later and return to the previous context.
 # -------------------------------------------------------------------
 
+def _raise_no_group(item):
+    raise Exception("Error: In a fragment but no group is active. Call enter_group() first.")
+
+
 class ScenarioBuilder:
-    def __init__(self):
+    def __init__(self, verbose=False):
+        # When verbose, every build step is reported on stdout.
+        self._verbose = verbose
         # The base list holds events and fragments in the order they occur.
+        # Only the builder may add to it: get_scenario() caches a snapshot of it,
+        # and mutating base directly is unsupported.
         self.base = []
         # When inside a fragment these hold the active fragment and group.
         self.current_fragment = None
         self.current_group = None
-        # The state_stack saves the (fragment, group) state when entering a new fragment.
-        self.state_stack = []
-        # Counters for unique IDs.
-        self.event_counter = 1
-        self.group_counter = 1
-        self.fragment_counter = 1
+        # The state stack saves the fragment and group when entering a new fragment,
+        # in two parallel lists so no tuple is built per entry. Both are preallocated
+        # and grown by doubling; _sp is the index of the next free slot.
+        self._frag_stack = [None] * 32
+        self._group_stack = [None] * 32
+        self._sp = 0
+        # Cached tuple snapshot of base returned by get_scenario(); None once base changes.
+        self._base_view = None
+        # Where new events are appended: the base list, the active group's item
+        # list, or _raise_no_group while inside a fragment with no active group.
+        self._sink = self._append_base
+        # Iterators handing out unique IDs.
+        self._event_ids = itertools.count(1)
+        self._group_ids = itertools.count(1)
+        self._frag_ids = itertools.count(1)
+        # Deduplicates equal exchanged_items tuples so repeated payloads share one object.
+        self._items_cache = {}
 
     def add_message(self, exchanged_items):
         """Adds a Message event. If not in a fragment, it goes to the base; otherwise to the current group."""
-        message = Message(self.event_counter, exchanged_items)
-        self.event_counter += 1
+        message = Message(next(self._event_ids), self._intern_items(exchanged_items))
+        self._sink(message)
+        if self._verbose:
+            self._report_added(message)
+        return message
 
+    def add_messages_bulk(self, batch):
+        """
+        Adds one Message event per entry of batch (each a list of exchanged items),
+        in order, to the same place add_message would. Returns the new messages.
+        """
         if self.current_fragment is None:
-            self.base.append(message)
-            print(f"Added {message} to BASE")
+            target = self.base
+            self._base_view = None
+        elif self.current_group is None:
+            _raise_no_group(None)
         else:
-            if self.current_group is None:
-                raise Exception("Error: In a fragment but no group is active. Call enter_group() first.")
-            self.current_group.add_item(message)
-            print(f"Added {message} to {self.current_group.name} in {self.current_fragment.name}")
-        return message
+            target = self.current_group.items
+        # batch goes first so zip stops without drawing an extra ID.
+        intern_items = self._intern_items
+        messages = [Message(i, intern_items(items)) for items, i in zip(batch, self._event_ids)]
+        target.extend(messages)
+        if self._verbose:
+            for message in messages:
+                self._report_added(message)
+        return messages
 
     def add_state(self, state_info):
         """Adds a State event. If not in a fragment, it goes to the base; otherwise to the current group."""
-        state_event = State(self.event_counter, state_info)
-        self.event_counter += 1
+        state_event = State(next(self._event_ids), state_info)
+        self._sink(state_event)
+        if self._verbose:
+            self._report_added(state_event)
+        return state_event
 
+    def _report_added(self, event):
         if self.current_fragment is None:
-            self.base.append(state_event)
-            print(f"Added {state_event} to BASE")
+            print(f"Added {event.full_repr()} to BASE")
         else:
-            if self.current_group is None:
-                raise Exception("Error: In a fragment but no group is active. Call enter_group() first.")
-            self.current_group.add_item(state_event)
-            print(f"Added {state_event} to {self.current_group.name} in {self.current_fragment.name}")
-        return state_event
+            print(f"Added {event.full_repr()} to {self.current_group.name} in {self.current_fragment.name}")
+
+    def _append_base(self, item):
+        self._base_view = None
+        self.base.append(item)
+
+    def _intern_items(self, exchanged_items):
+        """
+        Returns a list or tuple of exchanged items as a tuple, shared with any equal
+        tuple seen before. Other payloads are returned unchanged.
+        """
+        if type(exchanged_items) not in (list, tuple):
+            return exchanged_items
+        items = tuple(exchanged_items)
+        try:
+            return self._items_cache.setdefault(items, items)
+        except TypeError:  # unhashable entries: keep the tuple without sharing it
+            return items
+
+    def _update_sink(self):
+        """Points _sink at the list that receives events in the current context."""
+        if self.current_fragment is None:
+            self._sink = self._append_base
+        elif self.current_group is None:
+            self._sink = _raise_no_group
+        else:
+            self._sink = self.current_group.items.append
 
     def enter_fragment(self):
         """
@@ -127,21 +265,29 @@ class ScenarioBuilder:
           - Or to the current group's items if nested.
         The current (fragment, group) state is saved.
         """
-        frag = Fragment(self.fragment_counter, f"Fragment {self.fragment_counter}")
-        self.fragment_counter += 1
+        frag_id = next(self._frag_ids)
+        frag = Fragment(frag_id, f"Fragment {frag_id}")
 
         if self.current_fragment is None:
-            self.base.append(frag)
+            self._append_base(frag)
         else:
             if self.current_group is None:
                 raise Exception("Error: Cannot attach a new fragment because no active group exists.")
-            self.current_group.add_item(frag)
-        print(f"Entered {frag.name}")
+            self.current_group.items.append(frag)
+        if self._verbose:
+            print(f"Entered {frag.name}")
 
         # Save the current state and update the current fragment.
-        self.state_stack.append((self.current_fragment, self.current_group))
+        sp = self._sp
+        if sp == len(self._frag_stack):
+            self._frag_stack.extend([None] * sp)
+            self._group_stack.extend([None] * sp)
+        self._frag_stack[sp] = self.current_fragment
+        self._group_stack[sp] = self.current_group
+        self._sp = sp + 1
         self.current_fragment = frag
         self.current_group = None  # Must call enter_group() next within the fragment.
+        self._sink = _raise_no_group
         return frag
 
     def enter_group(self, guard=None):
@@ -152,48 +298,153 @@ class ScenarioBuilder:
         """
         if self.current_fragment is None:
             raise Exception("Error: Cannot enter a group when not inside a fragment.")
-        group = Group(self.group_counter, f"Group {self.group_counter}", guard=guard)
-        self.group_counter += 1
-        self.current_fragment.add_group(group)
+        if isinstance(guard, str):
+            guard = sys.intern(guard)
+        group_id = next(self._group_ids)
+        group = Group(group_id, f"Group {group_id}", guard=guard)
+        self.current_fragment.groups.append(group)
         self.current_group = group
-        guard_text = f" with guard: {guard}" if guard is not None else ""
-        print(f"Entered {group.name}{guard_text} in {self.current_fragment.name}")
+        self._sink = group.items.append
+        if self._verbose:
+            guard_text = f" with guard: {guard}" if guard is not None else ""
+            print(f"Entered {group.name}{guard_text} in {self.current_fragment.name}")
         return group
 
     def exit_fragment(self):
         """
         Exits the current fragment and restores the previous (fragment, group) state.
         """
-        if not self.state_stack:
+        if not self._sp:
             raise Exception("Error: No fragment to exit from.")
-        prev_fragment, prev_group = self.state_stack.pop()
-        print(f"Exiting {self.current_fragment.name}, returning to " +
-              (f"{prev_fragment.name}" if prev_fragment else "BASE"))
+        sp = self._sp = self._sp - 1
+        prev_fragment = self._frag_stack[sp]
+        prev_group = self._group_stack[sp]
+        self._frag_stack[sp] = self._group_stack[sp] = None
+        if self._verbose:
+            print(f"Exiting {self.current_fragment.name}, returning to " +
+                  (f"{prev_fragment.name}" if prev_fragment else "BASE"))
         self.current_fragment, self.current_group = prev_fragment, prev_group
+        self._update_sink()
 
     def get_scenario(self):
-        """Returns the top-level (base) scenario list."""
-        return self.base
+        """
+        Returns the top-level (base) scenario as an immutable tuple.
+        The tuple is built on first use and cached until the builder next adds to
+        the base, so repeated calls in between return the same object.
+        """
+        if self._base_view is None:
+            self._base_view = tuple(self.base)
+        return self._base_view
+
+    def to_arrays(self):
+        """
+        Flattens the scenario's events, in chronological order, into a ScenarioArrays.
+        Fragments and groups only contribute the events they contain. Requires numpy.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("ScenarioBuilder.to_arrays() requires numpy.") from None
+        ids, kinds, payload_refs = [], [], []
+        stack = [iter(self.base)]
+        while stack:
+            for item in stack[-1]:
+                t = type(item)
+                if t is Message:
+                    ids.append(item.id)
+                    kinds.append(KIND_MESSAGE)
+                    payload_refs.append(item.exchanged_items)
+                elif t is State:
+                    ids.append(item.id)
+                    kinds.append(KIND_STATE)
+                    payload_refs.append(item.state_info)
+                elif t is Fragment:
+                    stack.append(iter(item.groups))
+                    break
+                elif t is Group:
+                    stack.append(iter(item.items))
+                    break
+            else:
+                stack.pop()
+        return ScenarioArrays(
+            ids=np.asarray(ids, dtype=np.int64),
+            kinds=np.asarray(kinds, dtype=np.uint8),
+            payload_refs=payload_refs,
+        )
 
 
 # -------------------------------------------------------------------
 # A helper function to pretty–print the scenario tree.
-# This recursively prints messages, state events, fragments, and groups.
+# This walks messages, state events, fragments, and groups depth-first
+# using an explicit stack, so arbitrarily deep scenarios do not recurse.
+# Each item is formatted by the handler registered for its exact type; a
+# handler appends its lines to out and returns the (children, indent) to
+# visit next, or None for leaves.
 # -------------------------------------------------------------------
 
+# Indentation strings for the first 64 levels, indexed by indent.
+_SPACERS = ["  " * i for i in range(64)]
+
+
+def _spacer(indent):
+    return _SPACERS[indent] if indent < 64 else "  " * indent
+
+
+def _format_leaf(item, indent, spacer, out):
+    out.append("".join((spacer, "- ", item.full_repr())))
+    return None
+
+
+def _format_fragment(item, indent, spacer, out):
+    out.append("".join((spacer, "- ", item.name, " (Fragment):")))
+    return item.groups, indent
+
+
+def _format_group(item, indent, spacer, out):
+    if item.guard is None:
+        out.append("".join((spacer, "  * ", item.name, " (Group):")))
+    else:
+        out.append("".join((spacer, "  * ", item.name, " [Guard: ", str(item.guard), "] (Group):")))
+    return item.items, indent + 3
+
+
+def _format_unknown(item, indent, spacer, out):
+    out.append("".join((spacer, "- Unknown item: ", str(item))))
+    return None
+
+
+_FORMATTERS = {
+    Message: _format_leaf,
+    State: _format_leaf,
+    Group: _format_group,
+    Fragment: _format_fragment,
+}
+
+
+def _format_scenario(items, indent=0):
+    """Returns the printed lines for items as a list of strings."""
+    # The node classes are never subclassed, so an exact type(item) lookup is enough.
+    dispatch = _FORMATTERS.get
+    out = []
+    stack = [(iter(items), indent, _spacer(indent))]
+    while stack:
+        it, ind, spacer = stack[-1]
+        try:
+            item = next(it)
+        except StopIteration:
+            stack.pop()
+            continue
+        children = dispatch(type(item), _format_unknown)(item, ind, spacer, out)
+        if children is not None:
+            child_items, child_indent = children
+            stack.append((iter(child_items), child_indent, _spacer(child_indent)))
+    return out
+
+
 def print_scenario(items, indent=0):
-    spacer = "  " * indent
-    for item in items:
-        if isinstance(item, Message) or isinstance(item, State):
-            print(f"{spacer}- {item}")
-        elif isinstance(item, Fragment):
-            print(f"{spacer}- {item.name} (Fragment):")
-            for group in item.groups:
-                guard_str = f" [Guard: {group.guard}]" if group.guard is not None else ""
-                print(f"{spacer}  * {group.name}{guard_str} (Group):")
-                print_scenario(group.items, indent + 3)
-        else:
-            print(f"{spacer}- Unknown item: {item}")
+    out = _format_scenario(items, indent)
+    if out:
+        sys.stdout.write("\n".join(out) + "\n")
 
 
 # -------------------------------------------------------------------
@@ -206,7 +457,7 @@ def print_scenario(items, indent=0):
 # -------------------------------------------------------------------
 
 if __name__ == "__main__":
-    builder = ScenarioBuilder()
+    builder = ScenarioBuilder(verbose=True)
 
     # Base-level events:
     builder.add_message(["data1", "data2"])
@@ -233,8 +484,6 @@ if __name__ == "__main__":
     print_scenario(builder.get_scenario())
 
     # Optionally, you can inspect the raw underlying structure:
-    print("\nRaw structure (using pprint):")
-    pprint.pprint(builder.get_scenario())
-
     print("\nRaw structure:")
-    print(builder.base)
+    for item in builder.get_scenario():
+        print(item.full_repr())
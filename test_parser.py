@@ -0,0 +1,257 @@
+import contextlib
+import importlib.util
+import io
+import unittest
+
+import parser
+from parser import (KIND_MESSAGE, KIND_STATE, Fragment, Group, Message, ScenarioBuilder, State,
+                    count_messages, print_scenario)
+
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+HAVE_NUMBA = importlib.util.find_spec("numba") is not None
+
+
+def render(items):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        print_scenario(items)
+    return out.getvalue()
+
+
+class PrintScenarioTest(unittest.TestCase):
+    def test_deep_tree(self):
+        depth = 2000
+        b = ScenarioBuilder()
+        for i in range(depth):
+            b.enter_fragment()
+            b.enter_group()
+            b.add_message([i])
+        for _ in range(depth):
+            b.exit_fragment()
+
+        lines = render(b.base).splitlines()
+        self.assertEqual(len(lines), 3 * depth)
+        self.assertEqual(lines[-1], "  " * (3 * depth) + f"- Message({depth}, ({depth - 1},))")
+
+
+class ReprTest(unittest.TestCase):
+    def test_short_repr(self):
+        self.assertEqual(repr(Message(1, ("a",))), "Message(#1)")
+        self.assertEqual(repr(State(2, "s")), "State(#2)")
+        self.assertEqual(repr(Group(3, "Group 3")), "Group(#3)")
+        self.assertEqual(repr(Fragment(4, "Fragment 4")), "Fragment(#4)")
+
+    def test_full_repr(self):
+        frag = Fragment(1, "Fragment 1")
+        group = Group(1, "Group 1", guard="x > 5")
+        frag.add_group(group)
+        group.add_item(Message(1, ("a", "b")))
+        group.add_item(State(2, "s"))
+        self.assertEqual(frag.full_repr(),
+                         "Fragment 1(groups=[Group 1(items=[Message(1, ('a', 'b')), State(2, s)], guard=x > 5)])")
+
+    def test_full_repr_of_foreign_item(self):
+        group = Group(1, "Group 1")
+        group.add_item(42)
+        self.assertEqual(group.full_repr(), "Group 1(items=[42])")
+
+
+class BuilderSinkTest(unittest.TestCase):
+    def test_raises_without_active_group(self):
+        b = ScenarioBuilder()
+        b.enter_fragment()
+        with self.assertRaisesRegex(Exception, "no group is active"):
+            b.add_message(["a"])
+        with self.assertRaisesRegex(Exception, "no group is active"):
+            b.add_state("s")
+
+    def test_raises_after_reentering_a_fragment(self):
+        b = ScenarioBuilder()
+        b.enter_fragment()
+        b.enter_group()
+        b.add_message(["a"])
+        b.enter_fragment()
+        with self.assertRaisesRegex(Exception, "no group is active"):
+            b.add_message(["b"])
+
+    def test_nested_exit_restores_outer_group(self):
+        b = ScenarioBuilder()
+        b.enter_fragment()
+        outer = b.enter_group()
+        b.enter_fragment()
+        inner = b.enter_group()
+        b.add_message(["inner"])
+        b.exit_fragment()
+        message = b.add_message(["outer"])
+        self.assertIs(outer.items[-1], message)
+        self.assertEqual(len(inner.items), 1)
+        b.exit_fragment()
+        state = b.add_state("base")
+        self.assertIs(b.base[-1], state)
+
+
+class StateStackTest(unittest.TestCase):
+    def test_exit_without_fragment_raises(self):
+        b = ScenarioBuilder()
+        with self.assertRaisesRegex(Exception, "No fragment to exit from"):
+            b.exit_fragment()
+        b.enter_fragment()
+        b.exit_fragment()
+        with self.assertRaisesRegex(Exception, "No fragment to exit from"):
+            b.exit_fragment()
+
+    def test_pop_clears_slots(self):
+        b = ScenarioBuilder()
+        b.enter_fragment()
+        b.enter_group()
+        b.enter_fragment()
+        b.exit_fragment()
+        b.exit_fragment()
+        self.assertEqual(b._sp, 0)
+        self.assertTrue(all(slot is None for slot in b._frag_stack))
+        self.assertTrue(all(slot is None for slot in b._group_stack))
+
+    def test_grows_past_initial_capacity(self):
+        depth = 100
+        b = ScenarioBuilder()
+        groups = []
+        for _ in range(depth):
+            b.enter_fragment()
+            groups.append(b.enter_group())
+        self.assertGreaterEqual(len(b._frag_stack), depth)
+        self.assertEqual(len(b._frag_stack), len(b._group_stack))
+        for group in reversed(groups[:-1]):
+            b.exit_fragment()
+            self.assertIs(b.current_group, group)
+            self.assertIs(b.add_state("s"), group.items[-1])
+        b.exit_fragment()
+        self.assertIsNone(b.current_fragment)
+
+
+class AddMessagesBulkTest(unittest.TestCase):
+    def test_ids_are_contiguous_with_single_adds(self):
+        b = ScenarioBuilder()
+        b.add_message(["a"])
+        bulk = b.add_messages_bulk([["b"], ["c"]])
+        last = b.add_message(["d"])
+        self.assertEqual([m.id for m in bulk], [2, 3])
+        self.assertEqual(last.id, 4)
+
+    def test_placement(self):
+        b = ScenarioBuilder()
+        at_base = b.add_messages_bulk([["a"], ["b"]])
+        self.assertEqual(b.base, at_base)
+        b.enter_fragment()
+        group = b.enter_group()
+        in_group = b.add_messages_bulk([["c"]])
+        self.assertEqual(group.items, in_group)
+        self.assertEqual(len(b.base), 3)
+
+    def test_raises_without_active_group_and_draws_no_id(self):
+        b = ScenarioBuilder()
+        b.enter_fragment()
+        with self.assertRaisesRegex(Exception, "no group is active"):
+            b.add_messages_bulk([["a"], ["b"]])
+        b.enter_group()
+        self.assertEqual(b.add_message(["c"]).id, 1)
+
+    def test_verbose_output(self):
+        b = ScenarioBuilder(verbose=True)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            b.add_messages_bulk([["a"], ["b", "c"]])
+        self.assertEqual(out.getvalue(),
+                         "Added Message(1, ('a',)) to BASE\n"
+                         "Added Message(2, ('b', 'c')) to BASE\n")
+
+
+class GetScenarioTest(unittest.TestCase):
+    def test_view_is_cached_until_base_changes(self):
+        b = ScenarioBuilder()
+        self.assertEqual(b.get_scenario(), ())
+        first = b.add_message(["a"])
+        view = b.get_scenario()
+        self.assertEqual(view, (first,))
+        self.assertIs(b.get_scenario(), view)
+
+        frag = b.enter_fragment()
+        b.enter_group()
+        b.add_state("inside")
+        view = b.get_scenario()
+        self.assertEqual(view, (first, frag))
+        b.add_message(["inside"])
+        self.assertIs(b.get_scenario(), view)
+        b.exit_fragment()
+
+        state = b.add_state("s")
+        self.assertEqual(b.get_scenario(), (first, frag, state))
+        bulk = b.add_messages_bulk([["b"], ["c"]])
+        self.assertEqual(b.get_scenario(), (first, frag, state, *bulk))
+
+
+class InternTest(unittest.TestCase):
+    def test_lists_and_tuples_are_shared(self):
+        b = ScenarioBuilder()
+        first = b.add_message(["a", "b"]).exchanged_items
+        self.assertEqual(first, ("a", "b"))
+        self.assertIs(b.add_message(("a", "b")).exchanged_items, first)
+
+    def test_unhashable_items_are_still_tuples(self):
+        b = ScenarioBuilder()
+        self.assertEqual(b.add_message([[1]]).exchanged_items, ([1],))
+
+    def test_other_payloads_are_kept(self):
+        b = ScenarioBuilder()
+        self.assertIsNone(b.add_message(None).exchanged_items)
+        self.assertEqual(b.add_message("abc").exchanged_items, "abc")
+
+    def test_guards_are_interned(self):
+        b = ScenarioBuilder()
+        b.enter_fragment()
+        first = b.enter_group(guard="".join(["x > ", "5"]))
+        second = b.enter_group(guard="".join(["x > ", "5"]))
+        self.assertIs(first.guard, second.guard)
+
+
+@unittest.skipUnless(HAVE_NUMPY, "numpy is not installed")
+class ToArraysTest(unittest.TestCase):
+    def build(self):
+        b = ScenarioBuilder()
+        b.add_message(["a"])
+        b.enter_fragment()
+        b.enter_group()
+        b.add_state("s")
+        b.enter_fragment()
+        b.enter_group()
+        b.add_message(["b"])
+        b.exit_fragment()
+        b.enter_group()
+        b.add_state("t")
+        b.exit_fragment()
+        b.add_message(["c"])
+        return b
+
+    def test_flattens_events_in_order(self):
+        import numpy as np
+
+        arrays = self.build().to_arrays()
+        self.assertEqual(arrays.ids.dtype, np.int64)
+        self.assertEqual(arrays.kinds.dtype, np.uint8)
+        self.assertEqual(arrays.ids.tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(arrays.kinds.tolist(),
+                         [KIND_MESSAGE, KIND_STATE, KIND_MESSAGE, KIND_STATE, KIND_MESSAGE])
+        self.assertEqual(arrays.payload_refs, [("a",), "s", ("b",), "t", ("c",)])
+
+    def test_count_messages(self):
+        kinds = self.build().to_arrays().kinds
+        self.assertEqual(parser._count_messages(kinds), 3)
+        self.assertEqual(count_messages(kinds), 3)
+
+    @unittest.skipUnless(HAVE_NUMBA, "numba is not installed")
+    def test_count_messages_is_compiled(self):
+        count_messages(self.build().to_arrays().kinds)
+        self.assertTrue(hasattr(parser._count_messages_kernel, "py_func"))
+
+
+if __name__ == "__main__":
+    unittest.main()